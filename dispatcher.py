@@ -0,0 +1,214 @@
+import logging
+import queue
+import threading
+import time
+import tkinter as tk
+from collections import deque
+
+class InlineExecutor:
+    """同步执行器，在发布事件的线程中直接调用回调"""
+    def submit(self, fn):
+        fn()
+
+class TkExecutor:
+    """Tk主循环执行器，任意线程提交的任务都在Tk主线程中执行
+    
+    Tk不是线程安全的，因此提交时只写入队列，由主线程通过after定时取出执行。
+    其他线程无法安全地调用after来唤醒主线程，所以即使队列为空也会按interval_ms持续轮询
+    （默认100Hz）。必须在Tk主线程中创建，窗口销毁前应调用stop()。
+    """
+    def __init__(self, root, interval_ms=10):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._tasks = queue.Queue()
+        self._running = True
+        self._after_id = self.root.after(self.interval_ms, self._pump)
+    
+    def submit(self, fn):
+        if not self._running:
+            raise RuntimeError("TkExecutor已停止，无法提交新任务")
+        self._tasks.put(fn)
+    
+    def stop(self):
+        """停止执行器，丢弃未执行的任务"""
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+    
+    def _pump(self):
+        # 每次只执行本轮开始时已排队的任务，执行中新提交的任务留到下一轮，
+        # 保证Tk主循环能在两轮之间处理重绘和输入
+        for _ in range(self._tasks.qsize()):
+            try:
+                fn = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn()
+            except Exception as e:
+                logging.error(f"Tk任务执行错误: {str(e)}")
+        if self._running:
+            try:
+                self._after_id = self.root.after(self.interval_ms, self._pump)
+            except tk.TclError:
+                # 窗口已销毁
+                self._running = False
+                self._after_id = None
+
+class _Subscriber:
+    """单个订阅者的投递状态与统计"""
+    def __init__(self, callback, executor, coalesce, max_pending):
+        self.callback = callback
+        self.executor = executor
+        self.coalesce = coalesce
+        self.max_pending = max_pending
+        # 同名回调（不同实例的绑定方法、lambda等）需区分，附加对象id保证唯一
+        self.name = f"{getattr(callback, '__qualname__', repr(callback))}#{id(callback):x}"
+        self.pending = deque()
+        self.scheduled = False
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+
+class CallbackDispatcher:
+    """回调事件分发器
+    
+    每个订阅者在各自指定的执行器上接收事件（Tk主循环、线程池或同步执行），
+    同一订阅者的事件按顺序串行投递。对于进度、视频帧等高频事件，
+    coalesce=True时只保留每个订阅者尚未投递的最新一个值，慢速订阅者不会拖慢发布线程；
+    不合并的订阅者可用max_pending限制积压数量，超出时丢弃最旧的事件并计入丢弃数。
+    每次投递只处理一批事件，剩余事件重新提交给执行器，避免长期占用Tk主线程。
+    执行器需提供submit(fn)方法，例如InlineExecutor、TkExecutor或
+    concurrent.futures.ThreadPoolExecutor。
+    """
+    def __init__(self, default_executor=None):
+        self.default_executor = default_executor or InlineExecutor()
+        self._subscribers = {}
+        self._lock = threading.Lock()
+    
+    def subscribe(self, event, callback, executor=None, coalesce=False, max_pending=None):
+        """订阅事件，重复订阅同一回调时返回False"""
+        with self._lock:
+            subscribers = self._subscribers.setdefault(event, [])
+            if any(sub.callback == callback for sub in subscribers):
+                return False
+            subscribers.append(_Subscriber(callback, executor or self.default_executor, coalesce, max_pending))
+            return True
+    
+    def unsubscribe(self, event, callback):
+        """取消订阅，未投递的事件将被丢弃"""
+        with self._lock:
+            subscribers = self._subscribers.get(event, [])
+            for sub in subscribers:
+                if sub.callback == callback:
+                    subscribers.remove(sub)
+                    sub.pending.clear()
+                    return True
+            return False
+    
+    def unsubscribe_all(self, event):
+        """取消某个事件的全部订阅"""
+        with self._lock:
+            for sub in self._subscribers.pop(event, []):
+                sub.pending.clear()
+    
+    def clear(self):
+        """取消全部订阅，用于关闭时停止投递"""
+        with self._lock:
+            for subscribers in self._subscribers.values():
+                for sub in subscribers:
+                    sub.pending.clear()
+            self._subscribers.clear()
+    
+    def publish(self, event, *args):
+        """发布事件，按各订阅者的执行器异步或同步投递"""
+        now = time.perf_counter()
+        to_schedule = []
+        with self._lock:
+            for sub in self._subscribers.get(event, []):
+                if sub.coalesce and sub.pending:
+                    sub.dropped += len(sub.pending)
+                    sub.pending.clear()
+                elif sub.max_pending and len(sub.pending) >= sub.max_pending:
+                    sub.pending.popleft()
+                    sub.dropped += 1
+                sub.pending.append((now, args))
+                if not sub.scheduled:
+                    sub.scheduled = True
+                    to_schedule.append(sub)
+        
+        for sub in to_schedule:
+            self._schedule(event, sub)
+    
+    def _schedule(self, event, sub):
+        """向订阅者的执行器提交一次投递，提交失败时丢弃其待处理事件"""
+        try:
+            sub.executor.submit(lambda: self._drain(event, sub))
+        except Exception as e:
+            logging.error(f"{event}事件投递错误: {str(e)}")
+            with self._lock:
+                sub.dropped += len(sub.pending)
+                sub.pending.clear()
+                sub.scheduled = False
+    
+    def _drain(self, event, sub):
+        """在订阅者的执行器中投递一批待处理事件
+        
+        合并订阅者每次只投递一个事件，其余订阅者只投递本次开始时已有的事件；
+        期间新到的事件重新提交给执行器处理。
+        """
+        with self._lock:
+            batch = 1 if sub.coalesce else len(sub.pending)
+        
+        for _ in range(batch):
+            with self._lock:
+                if not sub.pending:
+                    break
+                published_at, args = sub.pending.popleft()
+            
+            latency = time.perf_counter() - published_at
+            try:
+                sub.callback(*args)
+            except Exception as e:
+                logging.error(f"{event}回调函数错误: {str(e)}")
+                with self._lock:
+                    sub.errors += 1
+            
+            with self._lock:
+                sub.delivered += 1
+                sub.last_latency = latency
+                sub.total_latency += latency
+                sub.max_latency = max(sub.max_latency, latency)
+        
+        with self._lock:
+            if not sub.pending:
+                sub.scheduled = False
+                return
+        self._schedule(event, sub)
+    
+    def get_stats(self):
+        """获取各订阅者的投递延迟(秒)与丢弃计数，以"回调名#对象id"区分订阅者"""
+        stats = {}
+        with self._lock:
+            for event, subscribers in self._subscribers.items():
+                stats[event] = {
+                    sub.name: {
+                        "delivered": sub.delivered,
+                        "dropped": sub.dropped,
+                        "errors": sub.errors,
+                        "pending": len(sub.pending),
+                        "scheduled": sub.scheduled,
+                        "last_latency": sub.last_latency,
+                        "avg_latency": sub.total_latency / sub.delivered if sub.delivered else 0.0,
+                        "max_latency": sub.max_latency,
+                    }
+                    for sub in subscribers
+                }
+        return stats
@@ -13,6 +13,8 @@ import os
 from datetime import datetime
 from aiortc import RTCPeerConnection, RTCSessionDescription
 from aiohttp import ClientSession
+from concurrent.futures import ThreadPoolExecutor
+from dispatcher import CallbackDispatcher, TkExecutor
 import logging
 
 # 设置日志
@@ -47,27 +49,49 @@ class WebRTCPlayer:
         self.is_playing = False
         self.is_connected = False
         self.frame_queue = queue.Queue(maxsize=2)
-        self.frame_callback = None
-        self.playback_callback = None
+        self.dispatcher = CallbackDispatcher()
+        self._frame_callback = None
+        self._playback_callback = None
         self.frame_width = 0
         self.frame_height = 0
         self.loop = None
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 5
     
-    def set_frame_callback(self, callback):
-        self.frame_callback = callback
+    def set_frame_callback(self, callback, executor=None, coalesce=True):
+        """设置显示用的帧回调函数，替换上一次设置的回调，默认只投递最新一帧"""
+        if self._frame_callback:
+            self.dispatcher.unsubscribe("frame", self._frame_callback)
+        self._frame_callback = callback
+        if callback:
+            self.dispatcher.subscribe("frame", callback, executor, coalesce)
     
-    def set_playback_callback(self, callback):
-        self.playback_callback = callback
+    def add_frame_callback(self, callback, executor=None, coalesce=True, max_pending=None):
+        """添加额外的帧回调函数，录制等不能丢帧的订阅者需传入coalesce=False"""
+        self.dispatcher.subscribe("frame", callback, executor, coalesce, max_pending)
+    
+    def remove_frame_callback(self, callback):
+        """移除通过add_frame_callback添加的帧回调函数"""
+        self.dispatcher.unsubscribe("frame", callback)
+    
+    def set_playback_callback(self, callback, executor=None, coalesce=False):
+        """设置播放状态回调函数，替换上一次设置的回调"""
+        if self._playback_callback:
+            self.dispatcher.unsubscribe("playback", self._playback_callback)
+        self._playback_callback = callback
+        if callback:
+            self.dispatcher.subscribe("playback", callback, executor, coalesce)
+    
+    def get_callback_stats(self):
+        """获取各回调的投递延迟与丢弃统计"""
+        return self.dispatcher.get_stats()
     
     def _notify_frame(self, frame):
-        if self.frame_callback and frame is not None:
-            self.frame_callback(frame)
+        if frame is not None:
+            self.dispatcher.publish("frame", frame)
     
     def _notify_playback(self, is_playing):
-        if self.playback_callback:
-            self.playback_callback(is_playing)
+        self.dispatcher.publish("playback", is_playing)
     
     async def _create_peer_connection(self):
         self.pc = RTCPeerConnection()
@@ -232,9 +256,7 @@ class VideoPlayer:
         self.fps = 0
         self.duration = 0
         self.position = 0
-        self.frame_callbacks = []
-        self.playback_callbacks = []
-        self.progress_callbacks = []
+        self.dispatcher = CallbackDispatcher()
         self.lock = threading.Lock()
         self._play_thread = None
         self._user_seeking = False
@@ -416,59 +438,49 @@ class VideoPlayer:
         with self.lock:
             return self.current_frame.copy() if self.current_frame is not None else None
             
-    def add_frame_callback(self, callback):
-        """添加帧更新回调函数"""
-        if callback not in self.frame_callbacks:
-            self.frame_callbacks.append(callback)
+    def add_frame_callback(self, callback, executor=None, coalesce=True, max_pending=None):
+        """添加帧更新回调函数，默认只投递最新一帧，录制等不能丢帧的订阅者需传入coalesce=False"""
+        self.dispatcher.subscribe("frame", callback, executor, coalesce, max_pending)
             
-    def add_playback_callback(self, callback):
+    def add_playback_callback(self, callback, executor=None, coalesce=False):
         """添加播放状态回调函数"""
-        if callback not in self.playback_callbacks:
-            self.playback_callbacks.append(callback)
+        self.dispatcher.subscribe("playback", callback, executor, coalesce)
             
-    def add_progress_callback(self, callback):
-        """添加进度更新回调函数"""
-        if callback not in self.progress_callbacks:
-            self.progress_callbacks.append(callback)
+    def add_progress_callback(self, callback, executor=None, coalesce=True):
+        """添加进度更新回调函数，默认只投递最新进度
+        
+        进度与帧回调分别独立投递，不保证同步：收到的进度可能比已显示的帧略新或略旧，
+        需要精确对应当前帧的位置时应读取get_current_frame()与position。
+        """
+        self.dispatcher.subscribe("progress", callback, executor, coalesce)
             
     def remove_frame_callback(self, callback):
         """移除帧更新回调函数"""
-        if callback in self.frame_callbacks:
-            self.frame_callbacks.remove(callback)
+        self.dispatcher.unsubscribe("frame", callback)
             
     def remove_playback_callback(self, callback):
         """移除播放状态回调函数"""
-        if callback in self.playback_callbacks:
-            self.playback_callbacks.remove(callback)
+        self.dispatcher.unsubscribe("playback", callback)
             
     def remove_progress_callback(self, callback):
         """移除进度更新回调函数"""
-        if callback in self.progress_callbacks:
-            self.progress_callbacks.remove(callback)
+        self.dispatcher.unsubscribe("progress", callback)
+            
+    def get_callback_stats(self):
+        """获取各回调的投递延迟与丢弃统计"""
+        return self.dispatcher.get_stats()
             
     def _notify_frame_callback(self, frame):
         """通知帧更新回调函数"""
-        for callback in self.frame_callbacks:
-            try:
-                callback(frame)
-            except Exception as e:
-                logging.error(f"帧回调函数错误: {str(e)}")
+        self.dispatcher.publish("frame", frame)
                 
     def _notify_playback_callback(self, is_playing):
         """通知播放状态回调函数"""
-        for callback in self.playback_callbacks:
-            try:
-                callback(is_playing, self.is_paused)
-            except Exception as e:
-                logging.error(f"播放回调函数错误: {str(e)}")
+        self.dispatcher.publish("playback", is_playing, self.is_paused)
                 
     def _notify_progress_callback(self):
         """通知进度更新回调函数"""
-        for callback in self.progress_callbacks:
-            try:
-                callback(self.position, self.duration)
-            except Exception as e:
-                logging.error(f"进度回调函数错误: {str(e)}")
+        self.dispatcher.publish("progress", self.position, self.duration)
                 
     def _notify_callbacks(self):
         """通知所有回调函数"""
@@ -569,6 +581,10 @@ class MainWindow:
         self.recorder = None
         self.videowriter = None
         self.recording_filename = None
+        # 录制写入在独立的单线程中执行，与界面刷新互不影响且不丢帧
+        self.record_executor = ThreadPoolExecutor(max_workers=1)
+        self.record_lock = threading.Lock()
+        self.record_source = None
         
         # 确保录像目录存在
         self.recordings_dir = "recordings"
@@ -578,19 +594,24 @@ class MainWindow:
         self.recording_fps = 30
         self.recording_codec = "XVID"
         self.recording_format = "avi"
+        # 录制线程最多积压的帧数（约2秒），写入跟不上时丢弃最旧的帧
+        self.record_max_pending = 60
         
     def initialize_players(self):
         """初始化视频播放器"""
-        # WebRTC播放器
+        # 回调统一投递到Tk主线程执行，避免在解码线程中操作界面
+        self.ui_executor = TkExecutor(self.root)
+        
+        # WebRTC播放器（显示只取最新帧，录制帧由_attach_recorder按需订阅）
         self.webrtc_player = WebRTCPlayer()
-        self.webrtc_player.set_frame_callback(self.on_webrtc_frame)
-        self.webrtc_player.set_playback_callback(self.on_webrtc_playback_state)
+        self.webrtc_player.set_frame_callback(self.on_webrtc_frame, self.ui_executor)
+        self.webrtc_player.set_playback_callback(self.on_webrtc_playback_state, self.ui_executor)
         
         # 本地视频播放器
         self.video_player = VideoPlayer()
-        self.video_player.add_frame_callback(self.on_video_frame)
-        self.video_player.add_playback_callback(self.on_video_playback_state)
-        self.video_player.add_progress_callback(self.on_video_progress)
+        self.video_player.add_frame_callback(self.on_video_frame, self.ui_executor)
+        self.video_player.add_playback_callback(self.on_video_playback_state, self.ui_executor)
+        self.video_player.add_progress_callback(self.on_video_progress, self.ui_executor)
         
         # 当前活动的播放器
         self.active_player = None
@@ -612,12 +633,42 @@ class MainWindow:
         """当本地视频帧更新时的回调"""
         # 显示帧
         self.display_frame(frame)
-        # 如果正在录制，写入录像
-        if self.is_recording and self.videowriter:
-            try:
-                self.videowriter.write(frame)
-            except Exception as e:
-                logging.error(f"写入视频帧错误: {str(e)}")
+        
+    def _attach_recorder(self, player):
+        """开始录制时调用，将录制回调只订阅到被录制的播放器上"""
+        self._detach_recorder()
+        player.add_frame_callback(self.on_record_frame, self.record_executor,
+                                  coalesce=False, max_pending=self.record_max_pending)
+        self.record_source = player
+        
+    def _detach_recorder(self):
+        """停止录制时调用，取消录制回调的订阅"""
+        if self.record_source:
+            self.record_source.remove_frame_callback(self.on_record_frame)
+            self.record_source = None
+        
+    def on_record_frame(self, frame):
+        """录制线程中的帧回调，正在录制时写入每一帧
+        
+        开始和停止录制时必须在持有record_lock的情况下设置is_recording、videowriter
+        并释放videowriter，否则可能与本回调中的写入交错。
+        """
+        with self.record_lock:
+            if self.is_recording and self.videowriter:
+                try:
+                    self.videowriter.write(frame)
+                except Exception as e:
+                    logging.error(f"写入视频帧错误: {str(e)}")
+        
+    def on_close(self):
+        """关闭窗口：停止回调投递后再销毁Tk窗口"""
+        shutdown_event.set()
+        self._detach_recorder()
+        self.video_player.dispatcher.clear()
+        self.webrtc_player.dispatcher.clear()
+        self.ui_executor.stop()
+        self.record_executor.shutdown(wait=False)
+        self.root.destroy()
 
     def setup_ui_updates(self):
         """设置UI更新和快捷键"""
@@ -661,7 +712,7 @@ class MainWindow:
 if __name__ == "__main__":
     root = tk.Tk()
     app = MainWindow(root)
-    root.protocol("WM_DELETE_WINDOW", lambda: (shutdown_event.set(), root.destroy()))
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
     
     # 确保关闭所有连接
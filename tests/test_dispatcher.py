@@ -0,0 +1,317 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatcher import CallbackDispatcher, InlineExecutor, TkExecutor
+
+
+class FailingExecutor:
+    def submit(self, fn):
+        raise RuntimeError("executor stopped")
+
+
+def wait_idle(dispatcher, timeout=2.0):
+    """等待所有订阅者没有待投递事件且没有正在执行的投递，返回此时的统计"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        stats = dispatcher.get_stats()
+        if all(not s["pending"] and not s["scheduled"] for subs in stats.values() for s in subs.values()):
+            return stats
+        time.sleep(0.005)
+    raise AssertionError("dispatcher did not become idle")
+
+
+class FakeRoot:
+    """模拟Tk根窗口的after接口，由测试手动触发定时任务"""
+    def __init__(self):
+        self.scheduled = {}
+        self.next_id = 0
+
+    def after(self, ms, fn):
+        self.next_id += 1
+        self.scheduled[self.next_id] = fn
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.scheduled.pop(after_id, None)
+
+    def run_pending(self):
+        for after_id, fn in list(self.scheduled.items()):
+            del self.scheduled[after_id]
+            fn()
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_inline_delivers_every_event_in_order():
+    dispatcher = CallbackDispatcher()
+    received = []
+    dispatcher.subscribe("progress", received.append, InlineExecutor())
+    for i in range(50):
+        dispatcher.publish("progress", i)
+    assert received == list(range(50))
+
+
+def test_non_coalesced_subscriber_keeps_order_on_pool(pool):
+    dispatcher = CallbackDispatcher()
+    received = []
+
+    def slow(value):
+        time.sleep(0.001)
+        received.append(value)
+
+    dispatcher.subscribe("frame", slow, pool, coalesce=False)
+    for i in range(100):
+        dispatcher.publish("frame", i)
+    stats = wait_idle(dispatcher)
+    assert received == list(range(100))
+    (sub_stats,) = stats["frame"].values()
+    assert sub_stats["delivered"] == 100
+    assert sub_stats["dropped"] == 0
+
+
+def test_coalesced_subscriber_gets_latest_value(pool):
+    dispatcher = CallbackDispatcher()
+    started = threading.Event()
+    release = threading.Event()
+    received = []
+
+    def blocking(value):
+        received.append(value)
+        started.set()
+        release.wait(2.0)
+
+    dispatcher.subscribe("frame", blocking, pool, coalesce=True)
+    dispatcher.publish("frame", 0)
+    assert started.wait(2.0)
+    for i in range(1, 20):
+        dispatcher.publish("frame", i)
+    release.set()
+    stats = wait_idle(dispatcher)
+
+    assert received == [0, 19]
+    (sub_stats,) = stats["frame"].values()
+    assert sub_stats["delivered"] == 2
+    assert sub_stats["dropped"] == 18
+
+
+def test_slow_subscriber_does_not_block_others(pool):
+    dispatcher = CallbackDispatcher()
+    release = threading.Event()
+    fast = []
+    dispatcher.subscribe("frame", lambda value: release.wait(2.0), pool, coalesce=True)
+    dispatcher.subscribe("frame", fast.append, InlineExecutor())
+    for i in range(10):
+        dispatcher.publish("frame", i)
+    assert fast == list(range(10))
+    release.set()
+    wait_idle(dispatcher)
+
+
+def test_concurrent_publishers_account_for_every_event(pool):
+    dispatcher = CallbackDispatcher()
+    ordered = []
+    latest = []
+    dispatcher.subscribe("frame", ordered.append, pool, coalesce=False)
+    dispatcher.subscribe("frame", latest.append, pool, coalesce=True)
+
+    def publisher(base):
+        for i in range(200):
+            dispatcher.publish("frame", base + i)
+
+    threads = [threading.Thread(target=publisher, args=(n * 1000,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = wait_idle(dispatcher)
+
+    assert sorted(ordered) == sorted(n * 1000 + i for n in range(4) for i in range(200))
+    for sub_stats in stats["frame"].values():
+        assert sub_stats["pending"] == 0
+        assert sub_stats["delivered"] + sub_stats["dropped"] == 800
+
+
+def test_unsubscribe_during_drain_stops_delivery():
+    pool = ThreadPoolExecutor(max_workers=1)
+    dispatcher = CallbackDispatcher()
+    started = threading.Event()
+    release = threading.Event()
+    received = []
+
+    def blocking(value):
+        received.append(value)
+        started.set()
+        release.wait(2.0)
+
+    dispatcher.subscribe("playback", blocking, pool)
+    dispatcher.publish("playback", 0)
+    assert started.wait(2.0)
+    dispatcher.publish("playback", 1)
+    assert dispatcher.unsubscribe("playback", blocking)
+    release.set()
+    # 等待正在执行的投递结束
+    pool.shutdown(wait=True)
+    dispatcher.publish("playback", 2)
+    assert received == [0]
+    assert dispatcher.get_stats()["playback"] == {}
+
+
+def test_failing_executor_counts_drops_without_backlog():
+    dispatcher = CallbackDispatcher()
+    received = []
+    dispatcher.subscribe("playback", received.append, FailingExecutor())
+    for i in range(5):
+        dispatcher.publish("playback", i)
+    (sub_stats,) = dispatcher.get_stats()["playback"].values()
+    assert sub_stats["pending"] == 0
+    assert sub_stats["dropped"] == 5
+    assert sub_stats["delivered"] == 0
+
+
+def test_callback_errors_are_counted_and_delivery_continues():
+    dispatcher = CallbackDispatcher()
+    received = []
+
+    def flaky(value):
+        if value == 1:
+            raise ValueError("boom")
+        received.append(value)
+
+    dispatcher.subscribe("progress", flaky)
+    for i in range(3):
+        dispatcher.publish("progress", i)
+    (sub_stats,) = dispatcher.get_stats()["progress"].values()
+    assert received == [0, 2]
+    assert sub_stats["errors"] == 1
+    assert sub_stats["delivered"] == 3
+
+
+def test_stats_distinguish_subscribers_with_same_name():
+    class Listener:
+        def __init__(self):
+            self.values = []
+
+        def cb(self, value):
+            self.values.append(value)
+
+    dispatcher = CallbackDispatcher()
+    first, second = Listener(), Listener()
+    dispatcher.subscribe("frame", first.cb)
+    dispatcher.subscribe("frame", second.cb)
+    dispatcher.publish("frame", 1)
+    stats = dispatcher.get_stats()["frame"]
+    assert len(stats) == 2
+    assert all(s["delivered"] == 1 for s in stats.values())
+
+
+def test_tk_executor_runs_tasks_on_pump_and_rejects_after_stop():
+    root = FakeRoot()
+    executor = TkExecutor(root)
+    dispatcher = CallbackDispatcher()
+    received = []
+    dispatcher.subscribe("playback", received.append, executor)
+
+    dispatcher.publish("playback", 1)
+    assert received == []
+    root.run_pending()
+    assert received == [1]
+
+    executor.stop()
+    assert root.scheduled == {}
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None)
+    for i in range(5):
+        dispatcher.publish("playback", i)
+    (sub_stats,) = dispatcher.get_stats()["playback"].values()
+    assert sub_stats["pending"] == 0
+    assert sub_stats["dropped"] == 5
+
+
+def test_wait_idle_waits_for_callback_in_flight(pool):
+    dispatcher = CallbackDispatcher()
+    dispatcher.subscribe("frame", lambda value: time.sleep(0.05), pool)
+    dispatcher.publish("frame", 0)
+    stats = wait_idle(dispatcher)
+    (sub_stats,) = stats["frame"].values()
+    assert sub_stats["delivered"] == 1
+
+
+def test_max_pending_drops_oldest_events(pool):
+    dispatcher = CallbackDispatcher()
+    started = threading.Event()
+    release = threading.Event()
+    received = []
+
+    def blocking(value):
+        received.append(value)
+        started.set()
+        release.wait(2.0)
+
+    dispatcher.subscribe("frame", blocking, pool, max_pending=3)
+    dispatcher.publish("frame", 0)
+    assert started.wait(2.0)
+    for i in range(1, 10):
+        dispatcher.publish("frame", i)
+    release.set()
+    stats = wait_idle(dispatcher)
+
+    assert received == [0, 7, 8, 9]
+    (sub_stats,) = stats["frame"].values()
+    assert sub_stats["dropped"] == 6
+
+
+def test_slow_coalesced_subscriber_yields_tk_loop_between_events():
+    root = FakeRoot()
+    executor = TkExecutor(root)
+    dispatcher = CallbackDispatcher()
+    received = []
+
+    def display(value):
+        received.append(value)
+        # 模拟回调执行期间发布线程又送来新帧
+        if value < 100:
+            dispatcher.publish("frame", value + 1)
+
+    dispatcher.subscribe("frame", display, executor, coalesce=True)
+    dispatcher.publish("frame", 0)
+    root.run_pending()
+    assert received == [0]
+    root.run_pending()
+    assert received == [0, 1]
+    executor.stop()
+
+
+def test_non_coalesced_drain_only_handles_events_pending_at_start():
+    root = FakeRoot()
+    executor = TkExecutor(root)
+    dispatcher = CallbackDispatcher()
+    received = []
+
+    def handler(value):
+        received.append(value)
+        if value < 3:
+            dispatcher.publish("playback", value + 10)
+
+    dispatcher.subscribe("playback", handler, executor)
+    for i in range(3):
+        dispatcher.publish("playback", i)
+    root.run_pending()
+    assert received == [0, 1, 2]
+    root.run_pending()
+    assert received == [0, 1, 2, 10, 11, 12]
+    (sub_stats,) = dispatcher.get_stats()["playback"].values()
+    assert sub_stats["pending"] == 0
+    assert not sub_stats["scheduled"]
+    executor.stop()